@@ -69,21 +69,38 @@ class GPCData(object):
         return self.X[self.Y[:,0] == y]
 
 
+    def getClassCounts(self):
+        """
+        Compute and cache the number of data points in each class.
+        Use cached value when called after the first time.
+
+        :returns: array of counts indexed by class label, i.e. `[n0, n1]`
+        """
+        if not hasattr(self, 'ycounts') or self.ycounts is None:
+            self.ycounts = np.bincount(self.Y[:,0].astype(np.intp), minlength=2)
+        return self.ycounts
+
+
     def getDataShape(self):
-        xmu = self.X.mean(axis=0).flatten().tolist()
-        xsd = self.X.std(axis=0).flatten().tolist()
-        xmin = self.X.min(axis=0).flatten().tolist()
-        xmax = self.X.max(axis=0).flatten().tolist()
-        ysd = self.Y.std()
-        ymu = self.Y.mean()
-        return {
-            'x_mu':   xmu,
-            'x_sd':   xsd,
-            'x_min':  xmin,
-            'x_max':  xmax,
-            'y_sd':   ysd,
-            'y_mean': ymu
-        }
+        """
+        Compute and cache summary statistics of the inputs and the targets.
+        Use cached value when called after the first time.
+
+        :returns: dictionary of per-dimension mean, standard deviation, minimum
+        and maximum of the inputs, and mean and standard deviation of the
+        targets
+        """
+        if not hasattr(self, 'dataShape') or self.dataShape is None:
+            X, Y = self.X, self.Y
+            self.dataShape = {
+                'x_mu':   X.mean(axis=0).flatten().tolist(),
+                'x_sd':   X.std(axis=0).flatten().tolist(),
+                'x_min':  X.min(axis=0).flatten().tolist(),
+                'x_max':  X.max(axis=0).flatten().tolist(),
+                'y_sd':   Y.std(),
+                'y_mean': Y.mean()
+            }
+        return self.dataShape
 
 
     def inputRange(self, dims=None):
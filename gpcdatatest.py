@@ -13,21 +13,24 @@ Y[Y.flatten() == -1] = 0
 d = GPCData(X, Y)
 print d
 print d.getDataShape()
+assert list(d.getClassCounts()) == [d.getClass(0).shape[0], d.getClass(1).shape[0]]
+ds = d.getDataShape()
+assert d.getDataShape() is ds
+assert np.allclose(ds['x_mu'], X.mean(axis=0)) and np.allclose(ds['x_sd'], X.std(axis=0))
+assert np.allclose(ds['x_min'], X.min(axis=0)) and np.allclose(ds['x_max'], X.max(axis=0))
+assert np.isclose(ds['y_mean'], Y.mean()) and np.isclose(ds['y_sd'], Y.std())
 # print d.getClass(0)
 # print d.getClass(1)
 
 # 4D - Iris dataset
 data = pods.datasets.iris()
-X = data['X']
-Y = data['Y']
-versi_ind = np.where(Y == 'Iris-versicolor')
-virgi_ind = np.where(Y == 'Iris-virginica')
-X = np.hstack((X[versi_ind,:], X[virgi_ind,:])).squeeze()
-Ynum = np.zeros(Y.size)
-Ynum[virgi_ind] = 1
-Ynum = np.hstack((Ynum[versi_ind], Ynum[virgi_ind])).reshape(X.shape[0], 1)
+Y = data['Y'].flatten()
+ind = (Y == 'Iris-versicolor') | (Y == 'Iris-virginica')
+X = data['X'][ind]
+Ynum = (Y[ind] == 'Iris-virginica').astype(float).reshape(-1, 1)
 d = GPCData(X, Ynum, XLabel=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), YLabel=['Versicolor', 'Virginica'])
 print d
+assert list(d.getClassCounts()) == [d.getClass(0).shape[0], d.getClass(1).shape[0]]
 # xx, yy, xt, yt = d.kFoldSplits()
 # for i in range(5):
 #   print 'split %d:' % (i+1)
@@ -10,6 +10,13 @@ import GPy
 from gpcplot import GPCPlot
 from gpcdata import GPCData
 
+# Version of the training code, part of the key of trained models cached on
+# disk (see `trainKernel`). Increment it whenever a change to the training code
+# (e.g. `GPCKernel.train`, `trainFull`, `trainSVGP`, `gpss2gpy` or
+# `computeError`) would give different results, so that existing caches are
+# not used any more.
+TRAIN_CACHE_VERSION = 1
+
 
 class GPCKernel(object):
     """
@@ -159,7 +166,7 @@ class GPCKernel(object):
         self.errorRate = None
 
 
-    def train(self, mode='auto', n_folds=5):
+    def train(self, mode='auto', n_folds=5, cache=None):
         """
         Train a GP classification model using k-fold cross-validation and random
         restart
@@ -171,11 +178,27 @@ class GPCKernel(object):
         hyperparameters as initial values; if `n_folds` is an integer, always
         randomise the initialisation before training, even if `n_folds` is 1
         :type n_folds: None or int
+        :param cache: `trainKernel` cached on disk, as returned by
+        `cachedTrainKernel()`, so that a kernel which has been trained on the
+        same data before (e.g. in a previous run) is not trained again. It is
+        keyed on the kernel structure, or also on the hyperparameters if
+        `n_folds` is None. Defaults to None, i.e. no caching.
         """
         mode = mode.lower()
         assert mode in set(['full', 'svgp', 'auto']), "mode must be 'full', 'svgp' or 'auto'"
         assert n_folds is None or (isinstance(n_folds, int) and n_folds > 0), "n_folds must be None or positive integer"
 
+        if cache is not None:
+            if n_folds is None:
+                key = repr(self.kernel)
+            else:
+                key = structureKey(self.kernel)
+            key = 'v{0}:{1}'.format(TRAIN_CACHE_VERSION, key)
+            self.model, self.errorRate, self.isSparse = \
+                cache(key, self.data.X, self.data.Y, mode, n_folds, self)
+            self.kernel = gpy2gpss(self.model.kern)
+            return
+
         # Configure GP mode
         # TODO: threshold of data quantity for using SVGP instead of full inference
         if mode == 'auto':
@@ -324,7 +347,7 @@ class GPCKernel(object):
         return summands
 
 
-    def draw(self, filename, active_dims_only=False, draw_posterior=True):
+    def draw(self, filename, active_dims_only=False, draw_posterior=True, fig=None):
         """
         Plot the model and data points
 
@@ -333,6 +356,8 @@ class GPCKernel(object):
         dimensions (defaults to False)
         :param draw_posterior: True if want to draw the posterior contour
         (defaults to True)
+        :param fig: matplotlib figure to be cleared and reused (defaults to
+        None, i.e. a new figure is created and closed afterwards)
         """
         if active_dims_only:
             plot = GPCPlot.create(self.model, xlabels=self.data.XLabel, usetex=True,
@@ -340,7 +365,7 @@ class GPCKernel(object):
         else:
             plot = GPCPlot.create(self.model, xlabels=self.data.XLabel, usetex=True)
 
-        plot.draw(draw_posterior=draw_posterior)
+        plot.draw(draw_posterior=draw_posterior, fig=fig)
         plot.save(filename)
 
 
@@ -400,7 +425,7 @@ class GPCKernel(object):
         if isinstance(self.kernel, ff.ConstKernel):
             # TODO: this is ugly
             d = self.data
-            return min(d.getClass(0).shape[0], d.getClass(1).shape[0]) / float(d.getNum())
+            return d.getClassCounts().min() / float(d.getNum())
 
         if not hasattr(self, 'errorRate') or self.errorRate is None:
             self.errorRate = computeError(self.model, self.data.X, self.data.Y)
@@ -511,6 +536,41 @@ class GPCKernel(object):
 #                                            #
 ##############################################
 
+def cachedTrainKernel(memory):
+    """
+    Cache `trainKernel` on disk, for use by `GPCKernel.train()`.
+
+    Only the source of `trainKernel` itself is checked for changes, not the
+    training code it calls. Increment `TRAIN_CACHE_VERSION` after changing the
+    latter, or clear the cache directory.
+
+    :param memory: on-disk cache
+    :type memory: joblib.Memory
+    :returns: cached version of `trainKernel`
+    """
+    return memory.cache(trainKernel, ignore=['ker'])
+
+
+def trainKernel(key, X, Y, mode, n_folds, ker):
+    """
+    Train a kernel without caching and return the results. This is the
+    function cached on disk by `GPCKernel.train()`, which is why everything
+    that the results depend on is passed as an argument.
+
+    :param key: string identifying the training code version and the kernel
+    to be trained
+    :param X: training data points of `ker`
+    :param Y: training targets of `ker`
+    :param mode: see `GPCKernel.train()`
+    :param n_folds: see `GPCKernel.train()`
+    :param ker: `GPCKernel` object to be trained, excluded from the cache key
+    :returns: tuple of trained model, cross-validated error rate and whether
+    the model is sparse
+    """
+    ker.train(mode=mode, n_folds=n_folds)
+    return ker.model, ker.errorRate, ker.isSparse
+
+
 def gpss2gpy(kernel, data=None):
     """
     Convert a GPSS kernel to a GPy kernel recursively, applying constraints to
@@ -727,6 +787,19 @@ def gpss2latex(k):
         raise NotImplementedError("Unrecognised kernel type " + type(k).__name__)
 
 
+def structureKey(kernel):
+    """
+    String identifying the structure of a GPSS kernel, regardless of its
+    hyperparameters. The hyperparameters are removed before converting the
+    kernel to canonical form, as they would otherwise affect the order of the
+    operands.
+
+    :param kernel: GPSS kernel
+    :returns: string which is the same for all structurally equivalent kernels
+    """
+    return repr(removeKernelParams(kernel).canonical())
+
+
 def removeKernelParams(kernel):
     """
     Remove hyperparameters of a GPSS kernel and reset them to None.
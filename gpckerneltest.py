@@ -106,6 +106,17 @@ assert gpckernel.isKernelEqual(k3, k4)
 k4 = ff.SumKernel([k1, k1])
 assert not gpckernel.isKernelEqual(k3, k4)
 
+# Structure key, independent of the hyperparameters even when they affect the
+# canonical order of the operands
+def sumOfProducts(ls0, ls1, ls2):
+    k0 = ff.SqExpKernel(dimension=0, lengthscale=ls0, sf=1)
+    k1 = ff.SqExpKernel(dimension=1, lengthscale=ls1, sf=1)
+    k2 = ff.SqExpKernel(dimension=2, lengthscale=ls2, sf=1)
+    return ff.SumKernel([ff.ProductKernel([k0, k1]), ff.ProductKernel([k0.copy(), k2])])
+assert gpckernel.structureKey(sumOfProducts(1, 2, 3)) == gpckernel.structureKey(sumOfProducts(1, 3, 2))
+assert gpckernel.structureKey(sumOfProducts(1, 2, 3)) == gpckernel.structureKey(sumOfProducts(5, 0.1, 9))
+assert gpckernel.structureKey(k3) != gpckernel.structureKey(k4)
+
 # Misclassified Points
 print '\n\nMisclassified Points:'
 k0 = ff.SqExpKernel(dimension=0, lengthscale=1, sf=1.5)
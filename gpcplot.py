@@ -22,6 +22,12 @@ default_res = 256
 default_contours = [0.05, 0.25, 0.5, 0.75, 0.95]
 default_sd_contours = [0.05, 0.2, 0.5]
 
+# Version of the plotting code, part of the hash of figures cached on disk by
+# reports (see `gpcreport.figureHash`). Increment it whenever a change to this
+# module (or to `GPCKernel.draw`) changes how figures look, so that existing
+# figures are drawn again.
+FIGURE_CACHE_VERSION = 1
+
 
 class GPCPlot(object):
     """
@@ -58,14 +64,59 @@ class GPCPlot(object):
         self.active_dims = active_dims
         self.xlabels = xlabels
         self.usetex = usetex
+        self.frame = None
+        self.keepfig = False
 
-    def draw(self, draw_posterior=True):
+    def draw(self, draw_posterior=True, fig=None):
         raise NotImplementedError
 
+    def newFigure(self, fig=None):
+        """
+        Matplotlib figure to draw on. Creating a figure is costly compared to
+        simple plots, so a caller drawing many plots one after another can pass
+        the same figure each time. It is then cleared and reused, and left open
+        by save().
+
+        :param fig: figure to be reused, or None to create a new one
+        :returns: empty figure
+        """
+        if fig is None:
+            self.keepfig = False
+            return plt.figure()
+        fig.clf()
+        # Restore the defaults for plots that do not set them, including the
+        # subplot parameters changed by tight_layout()
+        fig.set_size_inches(matplotlib.rcParams['figure.figsize'], forward=False)
+        fig.set_dpi(matplotlib.rcParams['figure.dpi'])
+        fig.subplots_adjust(**dict((k, matplotlib.rcParams['figure.subplot.' + k])
+            for k in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')))
+        self.keepfig = True
+        return fig
+
+    def getPlotFrame(self, res=default_res):
+        """
+        Plotting frame of the active dimensions of the data points, as returned
+        by getFrame(), followed by the evaluation grid padded with zeros to the
+        full input dimension of the model.
+
+        The data points do not change between draws, so the frame is computed
+        on the first call and cached. The returned arrays must not be modified.
+
+        :returns: xmin, xmax, xrng, xgrd, fullxgrd
+        """
+        if self.frame is None:
+            m = self.model
+            xmin, xmax, xrng, xgrd = getFrame(m.X[:,self.active_dims], res=res)
+            fullxgrd = np.zeros((xgrd.shape[0], m.input_dim))
+            fullxgrd[:,self.active_dims] = xgrd
+            self.frame = xmin, xmax, xrng, xgrd, fullxgrd
+        return self.frame
+
     def save(self, fname):
-        self.fig.savefig(fname + '.eps')
-        plt.close(self.fig)
-        print 'DEBUG: GPCPlot.save(): fname={}'.format(fname + '.eps')
+        self.fig.savefig(fname + '.pdf')
+        if not self.keepfig:
+            plt.close(self.fig)
+        print 'DEBUG: GPCPlot.save(): fname={}'.format(fname + '.pdf')
 
 
 class GPCPlot1D(GPCPlot):
@@ -82,15 +133,16 @@ class GPCPlot1D(GPCPlot):
             usetex = True
         GPCPlot.__init__(self, model, active_dims, xlabels, usetex)
 
-    def draw(self, draw_posterior=True):
+    def draw(self, draw_posterior=True, fig=None):
         m = self.model
         plt.rc('text', usetex=True)
-        fig, ax = plt.subplots()
+        fig = self.newFigure(fig)
+        ax = fig.add_subplot(111)
         plots = {}
 
         # Data range
         active_X = m.X[:,self.active_dims]
-        xmin, xmax, _, xgrd = getFrame(active_X)
+        xmin, xmax, _, xgrd, fullxgrd = self.getPlotFrame()
         ax.set_xlim(xmin, xmax)
         ax.set_ylim(ymin=-0.2, ymax=1.2)
         ax.set_yticks([0, 0.5, 1])
@@ -105,8 +157,6 @@ class GPCPlot1D(GPCPlot):
 
         # Latent function with 95% confidence interval
         if draw_posterior:
-            fullxgrd = np.zeros((xgrd.shape[0], m.input_dim))
-            fullxgrd[:,self.active_dims] = xgrd
             mu, var = m._raw_predict(fullxgrd)
             stdev = np.sqrt(var)
             lower = m.likelihood.gp_link.transf(mu - 2 * stdev)
@@ -135,19 +185,22 @@ class GPCPlot2D(GPCPlot):
             usetex = True
         GPCPlot.__init__(self, model, active_dims, xlabels, usetex)
 
-    def draw(self, draw_posterior=True, draw_error=False):
+    def draw(self, draw_posterior=True, draw_error=False, fig=None):
         draw_error = draw_posterior and draw_error
         m = self.model
         plt.rc('text', usetex=True)
         plots = {}
+        fig = self.newFigure(fig)
         if draw_error:
-            fig, (ax0, ax1) = plt.subplots(nrows=1, ncols=2, sharex=True, sharey=True)
+            ax0 = fig.add_subplot(121)
+            ax1 = fig.add_subplot(122, sharex=ax0, sharey=ax0)
+            plt.setp(ax1.get_yticklabels(), visible=False)
         else:
-            fig, ax0 =  plt.subplots()
+            ax0 = fig.add_subplot(111)
 
         # Data range
         active_X = m.X[:,self.active_dims]
-        xmin, xmax, xrng, xgrd = getFrame(active_X)
+        xmin, xmax, xrng, xgrd, fullxgrd = self.getPlotFrame()
         ax0.set_xlim(xmin[0], xmax[0])
         ax0.set_ylim(xmin[1], xmax[1])
         plt.rc('text', usetex=self.usetex)
@@ -165,8 +218,6 @@ class GPCPlot2D(GPCPlot):
 
         # Latent function
         if draw_posterior:
-            fullxgrd = np.zeros((xgrd.shape[0], m.input_dim))
-            fullxgrd[:,self.active_dims] = xgrd
             mu, var = m._raw_predict(fullxgrd)
             sd = np.sqrt(var)
             sd = m.likelihood.gp_link.transf(mu + 2 * sd) - m.likelihood.gp_link.transf(mu - 2 * sd)
@@ -217,15 +268,17 @@ class GPCPlot3D(GPCPlot):
         self.outsize = None
         GPCPlot.__init__(self, model, active_dims, xlabels, False)
 
-    def draw(self, draw_posterior=True):
+    def draw(self, draw_posterior=True, fig=None):
+        # Mayavi scenes are not reused: `fig` is ignored
         m = self.model
         fig = mlab.figure(bgcolor=(1, 1, 1), fgcolor=(0, 0, 0), size=self.rendersize)
         plots = {}
 
         xpts = m.X[:,self.active_dims]
-        xmin, xmax, xrng, xgrd = getFrame(xpts, res=32)
+        xmin, xmax, xrng, xgrd, fullxgrd = self.getPlotFrame(res=32)
 
         # Normalise all axes to [0, 1]
+        xrng = xrng.copy()
         for i in range(xpts.shape[1]):
             xpts[:,i] = (xpts[:,i] - xmin[i]) / float(xmax[i] - xmin[i])
             xrng[:,i] = (xrng[:,i] - xmin[i]) / float(xmax[i] - xmin[i])
@@ -246,8 +299,6 @@ class GPCPlot3D(GPCPlot):
 
         # Contour surfaces of GP mean
         if draw_posterior:
-            fullxgrd = np.zeros((xgrd.shape[0], m.input_dim))
-            fullxgrd[:,self.active_dims] = xgrd
             mu, _ = m._raw_predict(fullxgrd)
             mu = m.likelihood.gp_link.transf(mu)
             xx, yy, zz = np.meshgrid(*tuple(xrng[:,i] for i in range(3)), indexing='ij')
@@ -317,10 +368,11 @@ class GPCPlotHD(GPCPlot):
             usetex = True
         GPCPlot.__init__(self, model, active_dims, xlabels, usetex)
 
-    def draw(self, draw_posterior=True):
+    def draw(self, draw_posterior=True, fig=None):
         m = self.model
         plt.rc('text', usetex=True)
-        fig, ax = plt.subplots()
+        fig = self.newFigure(fig)
+        ax = fig.add_subplot(111)
         plots = {}
 
         # Data range
@@ -6,101 +6,139 @@ Usage:
 ipython gpcplottest.py
 """
 
+# Figures are only saved, never shown: use the non-interactive backend
+import matplotlib
+matplotlib.use('Agg')
+matplotlib.interactive(False)
 import GPy
 import numpy as np
 import pods
+import multiprocessing as mp
 from gpcplot import GPCPlot as gpcplt
 
-# 1D
-data = pods.datasets.toy_linear_1d_classification(seed=497)
-X = data['X']
-Y = data['Y'][:, 0:1]
-Y[Y.flatten() == -1] = 0
-m = GPy.models.GPClassification(X, Y)
-
-plotobj = gpcplt.create(m, xlabels=(r'Toy x',))
-plotobj.draw()
-plotobj.save('./imgs/test1d_before')
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test1d_after')
-
-# 2D
-data = pods.datasets.crescent_data(seed=400)
-X = data['X']
-Y = data['Y']
-Y[Y.flatten()==-1] = 0
-m = GPy.models.GPClassification(X, Y, kernel=None)
-
-plotobj = gpcplt.create(m, xlabels=(r'Crescent $x_1$', r'Crescent $x_2$'), usetex=True)
-plotobj.draw()
-plotobj.save('./imgs/test2d_before')
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test2d_after')
-
-plotobj = gpcplt.create(m, active_dims=[1], xlabels=(r'Crescent $x_1$', r'Crescent $x_2$'), usetex=True)
-plotobj.draw()
-plotobj.save('./imgs/test2d2_before')
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test2d2_after')
-
-# 3D - Iris
-data = pods.datasets.iris()
-X = data['X']
-Y = data['Y']
-versi_ind = np.where(Y == 'Iris-versicolor')
-virgi_ind = np.where(Y == 'Iris-virginica')
-X = np.hstack((X[versi_ind,:], X[virgi_ind,:])).squeeze()
-Ynum = np.zeros(Y.size)
-Ynum[virgi_ind] = 1
-Ynum = np.hstack((Ynum[versi_ind], Ynum[virgi_ind])).reshape(X.shape[0], 1)
-m = GPy.models.GPClassification(X[:,0:3], Ynum, kernel=None)
-
-plotobj = gpcplt.create(m, xlabels=('Sepal Length', 'Sepal Width', 'Petal Length'))
-plotobj.draw()
-plotobj.save('./imgs/test3d_before')
-m.optimize()
-plotobj.draw()
-# plotobj.save('./imgs/test3d_after', animate=True)
-plotobj.save('./imgs/test3d_after')
-
-plotobj = gpcplt.create(m, active_dims=[0,2], xlabels=('Sepal Length', 'Sepal Width', 'Petal Length'))
-plotobj.draw()
-plotobj.save('./imgs/test3d2_before')
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test3d2_after')
-
-# 4D - Iris
-data = pods.datasets.iris()
-X = data['X']
-Y = data['Y']
-versi_ind = np.where(Y == 'Iris-versicolor')
-virgi_ind = np.where(Y == 'Iris-virginica')
-X = np.hstack((X[versi_ind,:], X[virgi_ind,:])).squeeze()
-Ynum = np.zeros(Y.size)
-Ynum[virgi_ind] = 1
-Ynum = np.hstack((Ynum[versi_ind], Ynum[virgi_ind])).reshape(X.shape[0], 1)
-m = GPy.models.GPClassification(X, Ynum, kernel=None)
-
-plotobj = gpcplt.create(m, xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test4d_after')
-
-plotobj = gpcplt.create(m, active_dims=[0,1,2], xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test4d2_after')
-
-plotobj = gpcplt.create(m, active_dims=[0,1], xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test4d3_after')
-
-plotobj = gpcplt.create(m, active_dims=[0], xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
-m.optimize()
-plotobj.draw()
-plotobj.save('./imgs/test4d4_after')
+# GPy silently falls back to a much slower NumPy implementation of its
+# stationary kernels (e.g. RBF) if its Cython extensions are not built.
+try:
+    from GPy.kern.src import stationary
+    cython_working = stationary.use_stationary_cython
+except ImportError:
+    # Older GPy (GPy.kern._src) records a failed Cython import in its config
+    from GPy.util.config import config
+    cython_working = config.getboolean('cython', 'working')
+assert cython_working, \
+    'GPy Cython kernels are not compiled. Reinstall with: pip install --no-binary GPy GPy'
+
+# L-BFGS-B settings shared by all optimisations below. The toy 1D and 2D
+# problems converge quickly, so they are given fewer iterations.
+opt_args = {'optimizer': 'lbfgsb', 'messages': False, 'gtol': 1e-5}
+
+# Also plot each model before it is (re-)optimised. These plots are rarely
+# looked at and double the plotting work, so they are off by default.
+save_before = False
+
+
+def test1d():
+    data = pods.datasets.toy_linear_1d_classification(seed=497)
+    X = data['X']
+    Y = data['Y'][:, 0:1]
+    Y[Y.flatten() == -1] = 0
+    m = GPy.models.GPClassification(X, Y)
+
+    plotobj = gpcplt.create(m, xlabels=(r'Toy x',))
+    if save_before:
+        plotobj.draw()
+        plotobj.save('./imgs/test1d_before')
+    m.optimize(max_iters=100, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test1d_after')
+
+
+def test2d():
+    data = pods.datasets.crescent_data(seed=400)
+    X = data['X']
+    Y = data['Y']
+    Y[Y.flatten()==-1] = 0
+    m = GPy.models.GPClassification(X, Y, kernel=None)
+
+    plotobj = gpcplt.create(m, xlabels=(r'Crescent $x_1$', r'Crescent $x_2$'), usetex=True)
+    if save_before:
+        plotobj.draw()
+        plotobj.save('./imgs/test2d_before')
+    m.optimize(max_iters=100, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test2d_after')
+
+    plotobj = gpcplt.create(m, active_dims=[1], xlabels=(r'Crescent $x_1$', r'Crescent $x_2$'), usetex=True)
+    if save_before:
+        plotobj.draw()
+        plotobj.save('./imgs/test2d2_before')
+    m.optimize(max_iters=100, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test2d2_after')
+
+
+def test3d(X, Ynum):
+    m = GPy.models.GPClassification(X[:,0:3], Ynum, kernel=None)
+
+    plotobj = gpcplt.create(m, xlabels=('Sepal Length', 'Sepal Width', 'Petal Length'))
+    if save_before:
+        plotobj.draw()
+        plotobj.save('./imgs/test3d_before')
+    m.optimize(max_iters=200, **opt_args)
+    plotobj.draw()
+    # plotobj.save('./imgs/test3d_after', animate=True)
+    plotobj.save('./imgs/test3d_after')
+
+    plotobj = gpcplt.create(m, active_dims=[0,2], xlabels=('Sepal Length', 'Sepal Width', 'Petal Length'))
+    if save_before:
+        plotobj.draw()
+        plotobj.save('./imgs/test3d2_before')
+    m.optimize(max_iters=200, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test3d2_after')
+
+
+def test4d(X, Ynum):
+    m = GPy.models.GPClassification(X, Ynum, kernel=None)
+
+    plotobj = gpcplt.create(m, xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
+    m.optimize(max_iters=200, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test4d_after')
+
+    plotobj = gpcplt.create(m, active_dims=[0,1,2], xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
+    m.optimize(max_iters=200, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test4d2_after')
+
+    plotobj = gpcplt.create(m, active_dims=[0,1], xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
+    m.optimize(max_iters=200, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test4d3_after')
+
+    plotobj = gpcplt.create(m, active_dims=[0], xlabels=('Sepal length', 'Sepal width', 'Petal length', 'Petal width'), usetex=False)
+    m.optimize(max_iters=200, **opt_args)
+    plotobj.draw()
+    plotobj.save('./imgs/test4d4_after')
+
+
+if __name__ == '__main__':
+    # Iris: versicolor vs virginica, shared by the 3D and 4D tests
+    data = pods.datasets.iris()
+    Y = data['Y'].flatten()
+    ind = (Y == 'Iris-versicolor') | (Y == 'Iris-virginica')
+    X = data['X'][ind]
+    Ynum = (Y[ind] == 'Iris-virginica').astype(float).reshape(-1, 1)
+
+    # The tests share no state, so run each of them in its own process. Only
+    # the input arrays are sent to the workers; models never leave them.
+    pool = mp.Pool(processes=4)
+    results = [
+        pool.apply_async(test1d),
+        pool.apply_async(test2d),
+        pool.apply_async(test3d, (X, Ynum)),
+        pool.apply_async(test4d, (X, Ynum)) ]
+    pool.close()
+    for r in results:
+        r.get()
+    pool.join()
@@ -1,49 +1,108 @@
 # Copyright (c) 2015, Qiurui He
 # Department of Engineering, University of Cambridge
 
+from __future__ import division, print_function
+# Figures are only ever written to files: use the non-interactive backend so
+# that no GUI event loop is set up for each of them
+import matplotlib
+matplotlib.use('Agg')
+matplotlib.interactive(False)
+import matplotlib.pyplot as plt
 import numpy as np
 import pylatex as pl
 import pylatex.utils as ut
-import os, shutil
+import os, copy, hashlib
+import multiprocessing as mp
 from datetime import datetime
 from gpckernel import GPCKernel
-from gpcdata import GPCData
+from gpcplot import FIGURE_CACHE_VERSION
+
+# Matplotlib figure reused by all draws in the same (worker) process, created
+# on first use by `drawKernel`
+workerFigure = None
 
 class GPCReport(object):
     """
     AutoGPC data analysis report.
     """
 
-    def __init__(self, root='./latex', name='default', paper='a4paper', fontsize='12pt', history=None, best1d=None, constkernel=None):
+    def __init__(self, root='./latex', name='default', paper='a4paper', fontsize='12pt', history=None, best1d=None, constkernel=None, path=None):
+        """
+        :param root: parent directory of the timestamped report directory
+        :param name: name of the report, appended to its directory name
+        :param path: report directory to be used instead of a new timestamped
+        one under `root`. Figures in it that are still up to date, e.g. from a
+        previous run on the same results, are not drawn again.
+        """
         self.name = name
         self.history = history
         self.best1d = best1d
         self.constker = constkernel
         self.summands = history[-1].toSummands()
         self.kers, self.cums = cumulateAdditiveKernels(self.summands)
+        self.ds = history[-1].data.getDataShape()
 
         # Prepare directory
-        now = datetime.now().strftime('%Y%m%d%H%M%S')
-        p = os.path.join(root, now + '_' + name)
-        try:
-            if os.path.exists(p): shutil.rmtree(p)
+        if path is None:
+            now = datetime.now().strftime('%Y%m%d%H%M%S')
+            p = os.path.join(root, now + '_' + name)
+        else:
+            p = path
+        # Reuse an existing directory: figures that are still up to date are
+        # not drawn again (see `drawKernel`)
+        if not os.path.isdir(p):
             os.makedirs(p)
-        except Exception as e:
-            print e
         self.path = p
+        # Output path prefix for figures, i.e. the directory with a trailing
+        # separator
+        self.prefix = os.path.join(p, '')
 
         # Figure numbering
         self.fignum = 1
 
+        # Figures are independent of each other and of the text, so they are
+        # rendered in worker processes while the document is assembled here.
+        # There is no point in more workers than figures: data, variables,
+        # and component and cumulative kernel of each additive component
+        n_figures = 1 + len(self.best1d) + 2 * len(self.kers)
+        self.pool = mp.Pool(processes=min(n_figures, mp.cpu_count()))
+
         # Make document
         self.doc = pl.Document(documentclass=pl.Command('documentclass',
             options=[fontsize, paper, 'twoside'],
             arguments='article'))
-        self.makePreamble()
-        self.makeIntro()
-        self.makeSummary()
-        self.describeVariables()
-        self.describeAdditiveComponents()
+        try:
+            self.makePreamble()
+            self.makeIntro()
+            self.makeSummary()
+            self.describeVariables()
+            self.describeAdditiveComponents()
+            self.pool.close()
+        except:
+            self.pool.terminate()
+            raise
+        finally:
+            self.pool.join()
+            self.pool = None
+
+
+    def drawAsync(self, ker, imgName, imgFormat, **kwargs):
+        """
+        Draw a kernel to a figure file in a worker process.
+
+        :param ker: kernel to be plotted
+        :type ker: GPCKernel
+        :param imgName: figure filename without extension
+        :param imgFormat: extension of the figure file written by `ker.draw()`
+        :param kwargs: keyword arguments for `ker.draw()`
+        :returns: `multiprocessing.pool.AsyncResult` whose value is the figure
+        filename relative to the report directory, available once the figure
+        has been written
+        """
+        ker = copy.copy(ker)
+        # Cut the back-link to the search tree to keep the pickled task small
+        ker.parent = None
+        return self.pool.apply_async(drawKernel, (ker, self.prefix, imgName, imgFormat, kwargs))
 
 
     def makePreamble(self):
@@ -84,17 +143,13 @@ class GPCReport(object):
         kern = self.history[1]
         doc = self.doc
         data = kern.data
-        dataShape = data.getDataShape()
 
         npts = data.getNum()
         ndim = data.getDim()
-        npos = data.getClass(1).shape[0]
-        nneg = data.getClass(0).shape[0]
+        nneg, npos = data.getClassCounts()
 
-        imgName = 'data'
-        imgFormat = '.eps' if ndim != 3 else '.png'
-        imgOutName = imgName + imgFormat
-        kern.draw(os.path.join(self.path, imgName), draw_posterior=False)
+        imgFormat = '.pdf' if ndim != 3 else '.png'
+        img = self.drawAsync(kern, 'data', imgFormat, draw_posterior=False)
 
         # with doc.create(pl.Section("The Dataset")):
         s = "The training dataset spans {0} input dimensions, which are ".format(ndim) \
@@ -109,14 +164,14 @@ class GPCReport(object):
         doc.append(ut.NoEscape(s))
 
         s = "\n\nThe training dataset contains {0} data points. ".format(npts) \
-          + r"Among them, {0} ({1:.2f}\%) have positive class labels, ".format(npos, npos / float(npts) * 100) \
-          + r"and the other {0} ({1:.2f}\%) have negative labels. ".format(nneg, nneg / float(npts) * 100) \
+          + r"Among them, {0} ({1:.2f}\%) have positive class labels, ".format(npos, 100.0 * npos / npts) \
+          + r"and the other {0} ({1:.2f}\%) have negative labels. ".format(nneg, 100.0 * nneg / npts) \
           + "All input dimensions as well as the class label assignments " \
           + "are plotted in Figure {0}. ".format(self.fignum)
         doc.append(ut.NoEscape(s))
 
         with doc.create(pl.Figure(position='htbp!')) as fig:
-            fig.add_image(imgOutName, width=ut.NoEscape(r'0.8\textwidth'))
+            fig.add_image(img.get(), width=ut.NoEscape(r'0.8\textwidth'))
             s = "The input dataset. " \
               + r"Positive samples (`{0}') are coloured red, ".format(data.YLabel[1]) \
               + r"and negative ones (`{0}') blue. ".format(data.YLabel[0])
@@ -175,78 +230,79 @@ class GPCReport(object):
             doc.append(ut.NoEscape(s))
 
 
-    def describeOneVariable(self, ker):
+    def describeOneVariable(self, ker, img):
         """
         Generate a subsection describing a particular variable.
 
         :param ker:
         :type ker:
+        :param img: pending figure of `ker`, as returned by `drawAsync()`
+        :type img: multiprocessing.pool.AsyncResult
         """
         assert isinstance(ker, GPCKernel), 'Argument must be of type GPCKernel'
         assert len(ker.getActiveDims()) == 1, 'The kernel must be one-dimensional'
 
         dim = ker.getActiveDims()[0]
         data = ker.data
-        ds = data.getDataShape()
+        ds = self.ds
 
         xmu, xsd, xmin, xmax = ds['x_mu'][dim], ds['x_sd'][dim], ds['x_min'][dim], ds['x_max'][dim]
         error = ker.error()
         mon = ker.monotonicity()
         per = ker.period()
 
+        var_str = dims2text([dim], data)
+        cap_var_str = dims2text([dim], data, cap=True)
+
         doc = self.doc
-        with doc.create(pl.Subsection(ut.NoEscape(dims2text([dim], data, cap=True)))):
+        with doc.create(pl.Subsection(ut.NoEscape(cap_var_str))):
             # Routine description
-            s = dims2text([dim], data, cap=True) + " has " \
-              + "mean value {0:.2f} and standard deviation {1:.2f}. ".format(xmu, xsd) \
-              + "Its observed minimum and maximum are {0:.2f} and {1:.2f} respectively. ".format(xmin, xmax) \
-              + "A GP classifier trained on this variable alone can achieve " \
-              + r"a cross-validated classification error of {0:.2f}\%. ".format(error * 100)
+            parts = [
+                cap_var_str + " has ",
+                "mean value {0:.2f} and standard deviation {1:.2f}. ".format(xmu, xsd),
+                "Its observed minimum and maximum are {0:.2f} and {1:.2f} respectively. ".format(xmin, xmax),
+                "A GP classifier trained on this variable alone can achieve ",
+                r"a cross-validated classification error of {0:.2f}\%. ".format(error * 100),
+                "\n\n" ]
 
             # Significance
-            s += "\n\n"
             e0 = float(self.constker.error())
             if error / e0 < 0.25:
-                s += "Compared with the null model (baseline), this variable "
-                s += "contains strong evidence whether the sample belongs to "
-                s += "class `{0}'. ".format(data.YLabel[1])
+                parts.append("Compared with the null model (baseline), this variable "
+                             "contains strong evidence whether the sample belongs to "
+                             "class `{0}'. ".format(data.YLabel[1]))
             elif error / e0 < 0.8:
-                s += "Compared with the null model (baseline), this variable "
-                s += "contains some evidence of class label assignment. "
+                parts.append("Compared with the null model (baseline), this variable "
+                             "contains some evidence of class label assignment. ")
             elif error / e0 < 1.0:
-                s += "This variable provides little evidence of class label "
-                s += r"assignment given a baseline error rate of {0:.2f}\%. ".format(e0 * 100)
+                parts.append("This variable provides little evidence of class label "
+                             r"assignment given a baseline error rate of {0:.2f}\%. ".format(e0 * 100))
             else:
-                s += "The classification performance (in terms of error rate) "
-                s += "based on this variable alone is even worse than "
-                s += r'that of the na{\"i}ve baseline classifier. '
+                parts.append("The classification performance (in terms of error rate) "
+                             "based on this variable alone is even worse than "
+                             r'that of the na{\"i}ve baseline classifier. ')
 
             # Monotonicity and periodicity - only do this for significant factors
             if error / e0 < 0.8:
                 if mon != 0:
                     corr_str = "positive" if mon > 0 else "negative"
-                    s += "There is a " + corr_str + " correlation between the value "
-                    s += "of this variable and the likelihood of the sample being "
-                    s += "classified as positive. "
+                    parts.append("There is a " + corr_str + " correlation between the value "
+                                 "of this variable and the likelihood of the sample being "
+                                 "classified as positive. ")
                 elif per != 0:
-                    s += "The class assignment is approximately periodic with "
-                    s += dims2text([dim], data) + ". "
-                    s += "The period is about {0:.2f}. ".format(per)
+                    parts.append("The class assignment is approximately periodic with "
+                                 + var_str + ". The period is about {0:.2f}. ".format(per))
                 else:
-                    s += "No significant monotonicity or periodicity "
-                    s += "is associated with this variable. "
+                    parts.append("No significant monotonicity or periodicity "
+                                 "is associated with this variable. ")
 
-            s += "The GP posterior trained on this variable is plotted in Figure {0}. ".format(self.fignum)
-            doc.append(ut.NoEscape(s))
+            parts.append("The GP posterior trained on this variable is plotted in Figure {0}. ".format(self.fignum))
+            doc.append(ut.NoEscape("".join(parts)))
 
             # Plotting
-            imgName = 'var{0}'.format(dim)
-            imgFormat = '.eps'
-            imgFilename = imgName + imgFormat
-            ker.draw(os.path.join(self.path, imgName), active_dims_only=True)
-            caption_str = r"Trained classifier on " + dims2text([dim], ker.data) + "."
+            caption_str = r"Trained classifier on " + var_str + "."
             with doc.create(pl.Figure(position='htbp!')) as fig:
-                fig.add_image(imgFilename, width=ut.NoEscape(r'0.7\textwidth'))
+                fig.add_image(img.get(), width=ut.NoEscape(r'0.7\textwidth'))
                 fig.add_caption(ut.NoEscape(caption_str))
                 self.fignum += 1
 
@@ -257,13 +313,18 @@ class GPCReport(object):
         """
         ks = self.best1d[:]
         ks.append(self.constker)
-        ks.sort(key=lambda k: round(k.getNLML(), 2))
-        ks.sort(key=lambda k: round(k.error(), 4))
+        ks, errors, nlmls = rankKernels(ks)
         data = ks[0].data
-        ds = data.getDataShape()
+        ds = self.ds
 
-        nlml_min = round(min([k.getNLML() for k in ks]), 2)
-        error_min = round(min([k.error() for k in ks]), 4)
+        # Format all numbers at once: rows of min, max and mean per dimension,
+        # and NLML and error per kernel
+        stats_str = np.char.mod('%.2f', np.array([ds['x_min'], ds['x_max'], ds['x_mu']]))
+        nlml_str = np.char.mod('%.2f', nlmls)
+        error_str = np.char.mod(r'%.2f\%%', errors * 100)
+        errors_r, nlmls_r = roundScores(errors, nlmls)
+        nlml_best = nlmls_r == nlmls_r.min()
+        error_best = errors_r == errors_r.min()
 
         doc = self.doc
         with doc.create(pl.Table(position='htbp!')) as tab:
@@ -291,7 +352,7 @@ class GPCReport(object):
             t.add_hline()
 
             # Entries
-            for k in ks:
+            for i, k in enumerate(ks):
                 if k is self.constker:
                     row = [
                         ut.italic('--', escape=False),
@@ -300,22 +361,22 @@ class GPCReport(object):
                         ut.italic('--', escape=False),
                         ut.italic('--', escape=False),
                         ut.italic(k.shortInterp(), escape=False),
-                        ut.italic('{0:.2f}'.format(k.getNLML()), escape=False),
-                        ut.italic(r'{0:.2f}\%'.format(k.error()*100), escape=False) ]
+                        ut.italic(nlml_str[i], escape=False),
+                        ut.italic(error_str[i], escape=False) ]
                 else:
                     dim = k.getActiveDims()[0]
                     row = [
                         dim+1,
                         data.XLabel[dim],
-                        '{0:.2f}'.format(ds['x_min'][dim]),
-                        '{0:.2f}'.format(ds['x_max'][dim]),
-                        '{0:.2f}'.format(ds['x_mu'][dim]),
+                        stats_str[0,dim],
+                        stats_str[1,dim],
+                        stats_str[2,dim],
                         k.shortInterp(),
-                        ut.NoEscape('{0:.2f}'.format(k.getNLML())),
-                        ut.NoEscape(r'{0:.2f}\%'.format(k.error()*100)) ]
-                if round(k.getNLML(), 2) == nlml_min:
+                        ut.NoEscape(nlml_str[i]),
+                        ut.NoEscape(error_str[i]) ]
+                if nlml_best[i]:
                     row[6] = ut.bold(row[6])
-                if round(k.error(), 4) == error_min:
+                if error_best[i]:
                     row[7] = ut.bold(row[7])
 
                 t.add_row(tuple(row))
@@ -331,6 +392,10 @@ class GPCReport(object):
         Generate a section describing all input dimensions / variables.
         """
         n_terms = len(self.best1d)
+        # Submit all figures first so that they are rendered in the background
+        imgs = [self.drawAsync(ker, 'var{0}'.format(ker.getActiveDims()[0]), '.pdf', active_dims_only=True)
+                for ker in self.best1d]
+
         doc = self.doc
         with doc.create(pl.Section("Individual Variable Analysis")):
             s = "First, we try to classify the training samples using only one " \
@@ -351,46 +416,49 @@ class GPCReport(object):
             doc.append(ut.NoEscape(s))
 
             for i in range(n_terms):
-                self.describeOneVariable(self.best1d[i])
+                self.describeOneVariable(self.best1d[i], imgs[i])
 
 
-    def describeOneAdditiveComponent(self, term):
+    def describeOneAdditiveComponent(self, term, images, error, nlml, delta):
         """
         Generate a subsection that describes one additive component.
 
         :param term: term to be analysed
         :type term: integer
+        :param images: pending figures of this term, as returned by
+        `drawAdditiveComponent()`, which are waited for only when included
+        :type images: tuple
+        :param error: cross-validated error of the cumulative kernel up to and
+        including this term
+        :param nlml: negative log marginal likelihood of the cumulative kernel
+        up to and including this term
+        :param delta: reduction of the cross-validated error with respect to
+        the previous term (ignored for the first term)
         """
         ker, cum = self.kers[term - 1], self.cums[term - 1]
         data = ker.data
         kdims = ker.getActiveDims()
-        error = cum.error()
-        if term > 1: delta = self.cums[term - 2].error() - error
-        nlml = cum.getNLML()
 
         doc = self.doc
         with doc.create(pl.Subsection("Component {0}".format(term))):
             if term == 1:
-                s = r"With only one additive component, the GP classifier can achieve " \
-                  + r"a cross-validated classification error of {0:.2f}\%. ".format(error * 100) \
-                  + r"The corresponding negative log marginal likelihood is {0:.2f}. ".format(nlml)
-                doc.append(ut.NoEscape(s))
-
-                s = r"This component operates on " + dims2text(kdims, data) + ", " \
-                  + r"as shown in Figure {0}. ".format(self.fignum)
-                doc.append(ut.NoEscape(s))
+                s = "".join([
+                    r"With only one additive component, the GP classifier can achieve ",
+                    r"a cross-validated classification error of {0:.2f}\%. ".format(error * 100),
+                    r"The corresponding negative log marginal likelihood is {0:.2f}. ".format(nlml),
+                    r"This component operates on ", dims2text(kdims, data), ", ",
+                    r"as shown in Figure {0}. ".format(self.fignum) ])
 
             else:
-                s = r"With {0} additive components, the cross-validated classification error ".format(term) \
-                  + r"can be reduced by {0:.2f}\% to {1:.2f}\%. ".format(delta * 100, error * 100) \
-                  + r"The corresponding negative log marginal likelihood is {0:.2f}. ".format(nlml)
-                doc.append(ut.NoEscape(s))
-
-                s = r"The additional component operates on " + dims2text(kdims, data) + ", " \
-                  + r"as shown in Figure {0}. ".format(self.fignum)
-                doc.append(ut.NoEscape(s))
+                s = "".join([
+                    r"With {0} additive components, the cross-validated classification error ".format(term),
+                    r"can be reduced by {0:.2f}\% to {1:.2f}\%. ".format(delta * 100, error * 100),
+                    r"The corresponding negative log marginal likelihood is {0:.2f}. ".format(nlml),
+                    r"The additional component operates on ", dims2text(kdims, data), ", ",
+                    r"as shown in Figure {0}. ".format(self.fignum) ])
 
-            self.makeInteractionFigure(ker, cum, term)
+            doc.append(ut.NoEscape(s))
+            self.makeInteractionFigure(ker, cum, images)
 
 
     def describeAdditiveComponents(self):
@@ -398,7 +466,15 @@ class GPCReport(object):
         Generate a section describing all additive components present.
         """
         n_terms = len(self.kers)
-        error = self.cums[-1].error()
+        errors = np.array([c.error() for c in self.cums])
+        nlmls = np.array([c.getNLML() for c in self.cums])
+        deltas = np.hstack((0, errors[:-1] - errors[1:]))
+        error = errors[-1]
+
+        # Submit all figures first. Each term only waits for its own figures
+        # when they are included.
+        images = [self.drawAdditiveComponent(i) for i in range(1, n_terms + 1)]
+
         doc = self.doc
         with doc.create(pl.Section("Additive Component Analysis")):
             terms_str = "only one additive component" if n_terms == 1 else "{0} additive components".format(n_terms)
@@ -418,7 +494,29 @@ class GPCReport(object):
             self.tabulateAll()
 
             for i in range(1, n_terms + 1):
-                self.describeOneAdditiveComponent(i)
+                self.describeOneAdditiveComponent(i, images[i - 1], errors[i - 1], nlmls[i - 1], deltas[i - 1])
+
+
+    def drawAdditiveComponent(self, term):
+        """
+        Draw the figures of one additive component in worker processes.
+
+        :param term: term to be plotted
+        :type term: integer
+        :returns: tuple of pending figures of the component itself and of the
+        cumulative kernel up to and including it, as returned by
+        `drawAsync()`. The latter is None if it is not plotted, i.e. for the
+        first term or when it involves more than three dimensions.
+        """
+        ker, cum = self.kers[term - 1], self.cums[term - 1]
+        cumDims = cum.getActiveDims()
+        img1Format = '.pdf' if len(ker.getActiveDims()) != 3 else '.png'
+        img1 = self.drawAsync(ker, 'additive{0}ker'.format(term), img1Format, active_dims_only=True)
+        if term == 1 or len(cumDims) > 3:
+            return img1, None
+        img2Format = '.pdf' if len(cumDims) != 3 else '.png'
+        img2 = self.drawAsync(cum, 'additive{0}cum'.format(term), img2Format, active_dims_only=True)
+        return img1, img2
 
 
     def tabulateAll(self):
@@ -440,13 +538,11 @@ class GPCReport(object):
         if len(self.summands) > 1:
             ks.append(best)
 
-        ks.sort(key=lambda k: round(k.getNLML(), 2))
-        ks.sort(key=lambda k: round(k.error(), 4))
-        data = ks[0].data
-        ds = data.getDataShape()
+        ks, errors, nlmls = rankKernels(ks)
 
-        nlml_min = round(min([k.getNLML() for k in ks]), 2)
-        error_min = round(min([k.error() for k in ks]), 4)
+        errors_r, nlmls_r = roundScores(errors, nlmls)
+        nlml_best = nlmls_r == nlmls_r.min()
+        error_best = errors_r == errors_r.min()
 
         doc = self.doc
         with doc.create(pl.Table(position='htbp!')) as tab:
@@ -464,23 +560,23 @@ class GPCReport(object):
             t.add_hline()
 
             # Entries
-            for k in ks:
+            for k, nlml, error, is_nlml_best, is_error_best in zip(ks, nlmls, errors, nlml_best, error_best):
                 if k is self.constker:
                     row = [
                         ut.italic('--', escape=False),
                         ut.italic('$' + k.latex() + '$ (Baseline)', escape=False),
-                        ut.italic('{0:.2f}'.format(k.getNLML()), escape=False),
-                        ut.italic(r'{0:.2f}\%'.format(k.error()*100), escape=False) ]
+                        ut.italic('{0:.2f}'.format(nlml), escape=False),
+                        ut.italic(r'{0:.2f}\%'.format(error*100), escape=False) ]
                 else:
                     dims = sorted(k.getActiveDims())
                     row = [
                         ut.NoEscape(', '.join([str(d + 1) for d in dims])),
                         ut.NoEscape('$' + k.latex() + '$'),
-                        ut.NoEscape('{0:.2f}'.format(k.getNLML())),
-                        ut.NoEscape(r'{0:.2f}\%'.format(k.error()*100)) ]
-                if round(k.getNLML(), 2) == nlml_min:
+                        ut.NoEscape('{0:.2f}'.format(nlml)),
+                        ut.NoEscape(r'{0:.2f}\%'.format(error*100)) ]
+                if is_nlml_best:
                     row[2] = ut.bold(row[2])
-                if round(k.error(), 4) == error_min:
+                if is_error_best:
                     row[3] = ut.bold(row[3])
 
                 t.add_row(tuple(row))
@@ -491,7 +587,7 @@ class GPCReport(object):
             tab.append(t)
 
 
-    def makeInteractionFigure(self, ker, cum, n_terms):
+    def makeInteractionFigure(self, ker, cum, images):
         """
         Create figure for interaction analysis, which includes a subfigure of
         the latest additive component and a subfigure of posterior of the overall
@@ -501,7 +597,9 @@ class GPCReport(object):
         :type ker: GPCKernel
         :param cum: overall compositional kernel up to and including `ker`
         :type cum: GPCKernel
-        :param n_terms: number of additive terms considered in `cum` so far
+        :param images: pending figures of `ker` and `cum`, as returned by
+        `drawAdditiveComponent()`
+        :type images: tuple
         """
         assert isinstance(ker, GPCKernel), 'Kernel must be of type GPCKernel'
         assert isinstance(cum, GPCKernel), 'Kernel must be of type GPCKernel'
@@ -509,41 +607,34 @@ class GPCReport(object):
         doc = self.doc
         kerDims = ker.getActiveDims()
         cumDims = cum.getActiveDims()
+        img1, img2 = images
 
-        img1Name = 'additive{0}ker'.format(n_terms)
-        img1Format = '.eps' if len(kerDims) != 3 else '.png'
-        img1Filename = img1Name + img1Format
-        ker.draw(os.path.join(self.path, img1Name), active_dims_only=True)
-
-        if n_terms == 1 or len(cumDims) > 3:
+        if img2 is None:
             # Only present current additive component
             caption_str = r"Trained classifier on " + dims2text(kerDims, ker.data) + "."
             with doc.create(pl.Figure(position='htbp!')) as fig:
-                fig.add_image(img1Filename, width=ut.NoEscape(r'0.7\textwidth'))
+                fig.add_image(img1.get(), width=ut.NoEscape(r'0.7\textwidth'))
                 fig.add_caption(ut.NoEscape(caption_str))
                 self.fignum += 1
 
         else:
             # Present both current component and cumulative kernel
-            img2Name = 'additive{0}cum'.format(n_terms)
-            img2Format = '.eps' if len(cumDims) != 3 else '.png'
-            img2Filename = img2Name + img2Format
-            cum.draw(os.path.join(self.path, img2Name), active_dims_only=True)
             caption1_str = r"Current additive component involving " + dims2text(kerDims, ker.data) + "."
-            caption2_str = r"Previous and current components combined, involving " + dims2text(cumDims, cum.data) + "."
-            caption_str = r"Trained classifier on " + dims2text(cumDims, cum.data) + "."
+            cum_str = dims2text(cumDims, cum.data)
+            caption2_str = r"Previous and current components combined, involving " + cum_str + "."
+            caption_str = r"Trained classifier on " + cum_str + "."
 
             with doc.create(pl.Figure(position='htbp!')) as fig:
                 with doc.create(pl.SubFigure(
                     position='b',
                     width=ut.NoEscape(r'0.47\textwidth') )) as subfig1:
-                    subfig1.add_image(img1Filename, width=ut.NoEscape(r'\textwidth'))
+                    subfig1.add_image(img1.get(), width=ut.NoEscape(r'\textwidth'))
                     subfig1.add_caption(ut.NoEscape(caption1_str))
                 doc.append(ut.NoEscape(r'\hfill'))
                 with doc.create(pl.SubFigure(
                     position='b',
                     width=ut.NoEscape(r'0.47\textwidth') )) as subfig2:
-                    subfig2.add_image(img2Filename, width=ut.NoEscape(r'\textwidth'))
+                    subfig2.add_image(img2.get(), width=ut.NoEscape(r'\textwidth'))
                     subfig2.add_caption(ut.NoEscape(caption2_str))
                 fig.add_caption(ut.NoEscape(caption_str))
                 self.fignum += 1
@@ -579,11 +670,7 @@ def list2text(l, cap=False):
     if len(l) == 1:
         return str(l[0])
     else:
-        text = ""
-        for i in range(len(l) - 2):
-            text = text + "{0}, ".format(l[i])
-        text += "{0} and {1}".format(l[-2], l[-1])
-        return text
+        return ", ".join([str(x) for x in l[:-1]]) + " and {0}".format(l[-1])
 
 
 def dims2text(dims, data, cap=False):
@@ -654,6 +741,99 @@ def sum2text(summands, cap=False):
     return text
 
 
+def drawKernel(ker, prefix, imgName, imgFormat, kwargs):
+    """
+    Draw a kernel to a figure file, unless the file already exists and was
+    drawn from the same trained kernel on the same data with the same options.
+    A sidecar file with extension '.hash' next to the figure records this.
+    This is a module-level function so that it can be dispatched to worker
+    processes by `multiprocessing.Pool`.
+
+    :param ker: kernel to be plotted
+    :type ker: GPCKernel
+    :param prefix: output directory including a trailing path separator
+    :param imgName: figure filename without extension
+    :param imgFormat: extension of the figure file written by `ker.draw()`
+    :param kwargs: dictionary of keyword arguments for `ker.draw()`
+    :returns: figure filename relative to the output directory
+    """
+    global workerFigure
+    path = prefix + imgName
+    hashFilename = path + '.hash'
+    key = figureHash(ker, kwargs)
+    if os.path.exists(path + imgFormat) and os.path.exists(hashFilename):
+        with open(hashFilename) as f:
+            if f.read() == key:
+                return imgName + imgFormat
+    if workerFigure is None:
+        workerFigure = plt.figure()
+    ker.draw(path, fig=workerFigure, **kwargs)
+    with open(hashFilename, 'w') as f:
+        f.write(key)
+    return imgName + imgFormat
+
+
+def figureHash(ker, kwargs):
+    """
+    Compute a digest identifying the figure of a kernel, i.e. of the version
+    of the plotting code, the kernel expression and its trained parameters,
+    the active dimensions, the data and the plotting options.
+
+    :param ker: kernel to be plotted
+    :type ker: GPCKernel
+    :param kwargs: dictionary of keyword arguments for `ker.draw()`
+    :returns: hexadecimal SHA-1 digest string
+    """
+    h = hashlib.sha1()
+    h.update(repr((FIGURE_CACHE_VERSION, ker.kernel, sorted(ker.getActiveDims()), sorted(kwargs.items()))).encode('utf-8'))
+    h.update(np.ascontiguousarray(ker.model.param_array).tobytes())
+    h.update(np.ascontiguousarray(ker.data.X).tobytes())
+    h.update(np.ascontiguousarray(ker.data.Y).tobytes())
+    return h.hexdigest()
+
+
+def rankKernels(ks):
+    """
+    Rank kernels in ascending order of cross-validated error (rounded to 4
+    decimal places), breaking ties by negative log marginal likelihood (rounded
+    to 2 decimal places). Each kernel is only queried once.
+
+    :param ks: list of GPCKernel objects
+    :returns: tuple `(ks, errors, nlmls)` of the ranked kernels, and arrays of
+    their errors and negative log marginal likelihoods in the same order
+    """
+    errors = np.array([k.error() for k in ks])
+    nlmls = np.array([k.getNLML() for k in ks])
+    errors_r, nlmls_r = roundScores(errors, nlmls)
+    order = np.lexsort((nlmls_r, errors_r))
+    return [ks[i] for i in order], errors[order], nlmls[order]
+
+
+def roundScores(errors, nlmls):
+    """
+    Round cross-validated errors to 4 and negative log marginal likelihoods to
+    2 decimal places, the precision at which kernels are compared. The built-in
+    `round` is used rather than `np.round` (which rounds halves to even), so
+    that the result agrees with `GPCKernel.betterThan`.
+
+    :param errors: sequence of cross-validated errors
+    :param nlmls: sequence of negative log marginal likelihoods
+    :returns: tuple of arrays of the rounded errors and NLMLs
+    """
+    return np.array([round(e, 4) for e in errors]), np.array([round(l, 2) for l in nlmls])
+
+
+def lastArgmin(a):
+    """
+    Find the index of the minimum of an array, choosing the last one in case
+    of ties (unlike `np.argmin`, which chooses the first one).
+
+    :param a: one-dimensional array
+    :returns: integer index into `a`
+    """
+    return len(a) - 1 - int(np.argmin(a[::-1]))
+
+
 def cumulateAdditiveKernels(summands):
     """
     Incrementally cumulate additive components of a kernel, producing the full
@@ -661,9 +841,12 @@ def cumulateAdditiveKernels(summands):
 
     :param summands: list of GPCKernel objects to be cumulated
     """
-    # Sort in descending order of cross-validated error
-    terms = sorted(summands, key=lambda k: k.error(), reverse=True)
-    ker = terms.pop()
+    # Start from the component with the lowest cross-validated error
+    terms = list(summands)
+    errors = np.empty(len(terms))
+    for i, k in enumerate(terms):
+        errors[i] = k.error()
+    ker = terms.pop(lastArgmin(errors))
     cum = ker
     kers = [ker]
     cums = [cum]
@@ -671,9 +854,13 @@ def cumulateAdditiveKernels(summands):
     # Progressively include more additive components according to the cross-
     # validated training error of the cumulated additive kernel
     while len(terms) > 0:
-        terms = sorted(terms, key=lambda k: cum.add(k).error(), reverse=True)
-        ker = terms.pop()
-        cum = cum.add(ker)
+        # Keep each candidate sum, so that the chosen one is reused rather than
+        # built and evaluated again
+        sums = [cum.add(k) for k in terms]
+        for i, c in enumerate(sums):
+            errors[i] = c.error()
+        j = lastArgmin(errors[:len(terms)])
+        ker, cum = terms.pop(j), sums[j]
         kers.append(ker)
         cums.append(cum)
 
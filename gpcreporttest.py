@@ -4,9 +4,14 @@
 import numpy as np
 import pods
 from gpcdata import GPCData
-from gpcreport import GPCReport
+from gpcreport import GPCReport, lastArgmin
 from gpcsearch import GPCSearch
 
+# Ties are resolved to the last minimum, as sorted(reverse=True) + pop() did
+assert lastArgmin(np.array([1., 0., 0.])) == 2
+assert lastArgmin(np.array([0., 1., 2.])) == 0
+assert lastArgmin(np.array([3.])) == 0
+
 data = pods.datasets.pima()
 X = data['X'][:250,[1,5,6,7]]
 Y = data['Y'][:250]
@@ -27,14 +32,10 @@ report.export()
 
 
 # data = pods.datasets.iris()
-# X = data['X']
-# Y = data['Y']
-# versi_ind = np.where(Y == 'Iris-versicolor')
-# virgi_ind = np.where(Y == 'Iris-virginica')
-# X = np.hstack((X[versi_ind,:], X[virgi_ind,:])).squeeze()
-# Ynum = np.zeros(Y.size)
-# Ynum[virgi_ind] = 1
-# Ynum = np.hstack((Ynum[versi_ind], Ynum[virgi_ind])).reshape(X.shape[0], 1)
+# Y = data['Y'].flatten()
+# ind = (Y == 'Iris-versicolor') | (Y == 'Iris-virginica')
+# X = data['X'][ind]
+# Ynum = (Y[ind] == 'Iris-virginica').astype(float).reshape(-1, 1)
 # d = GPCData(X, Ynum, XLabel=['Sepal Length', 'Sepal Width', 'Petal Length', 'Petal Width'], YLabel=['Versicolor', 'Virginica'])
 # print "Data size = %d" % (d.getDim() * d.getNum())
 # search = GPCSearch(data=d, max_depth=4, beam_width=2)
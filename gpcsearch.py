@@ -3,8 +3,12 @@
 
 import numpy as np
 import Queue as Q
+try:
+    import joblib
+except ImportError:
+    joblib = None
 import flexible_function as ff
-from gpckernel import GPCKernel
+from gpckernel import GPCKernel, cachedTrainKernel, structureKey
 from gpcdata import GPCData
 
 
@@ -12,7 +16,14 @@ class GPCSearch(object):
     """
     AutoGPC kernel search
     """
-    def __init__(self, data=None, base_kernels='SE', max_depth=3, beam_width=1):
+    def __init__(self, data=None, base_kernels='SE', max_depth=3, beam_width=1, cache_dir=None):
+        """
+        :param cache_dir: directory in which trained models are cached across
+        runs, so that searching the same data again skips training kernels
+        that have been trained before. Requires joblib. Defaults to None, i.e.
+        no caching. See `gpckernel.TRAIN_CACHE_VERSION` for invalidating the
+        cache after changes to the training code.
+        """
         assert isinstance(data, GPCData), "data must be of type GPCData"
         self.data = data
         # TODO: sanity check for base_kernels
@@ -21,6 +32,12 @@ class GPCSearch(object):
         self.maxDepth = max_depth
         # TODO: sanity check for beam_width
         self.beamWidth = beam_width
+        self.trainCache = None
+        if cache_dir is not None:
+            if joblib is None:
+                print "Warning: joblib is not installed. Trained models will not be cached."
+            else:
+                self.trainCache = cachedTrainKernel(joblib.Memory(cache_dir, verbose=0))
 
     def search(self):
         # Start from NoneKernel
@@ -37,12 +54,15 @@ class GPCSearch(object):
                 # Enforce new dimensions to be added each time
                 expanded = [x for x in k.expand() if len(x.getActiveDims()) > depth]
                 newkernels.extend(expanded)
+            # Different kernels in the beam may expand to the same kernel,
+            # which only needs to be trained once
+            newkernels = removeDuplicates(newkernels)
             if depth == 0:
                 kernels1d = newkernels
 
             kernels = newkernels
             for k in kernels:
-                k.train()
+                k.train(cache=self.trainCache)
             print "\n=====\nFully expanded kernel set at depth {0}:".format(depth+1)
             print '\n'.join(str(k) for k in kernels)
 
@@ -105,7 +125,7 @@ class GPCSearch(object):
         :returns: trained `GPCKernel` object which uses a constant kernel
         """
         k = GPCKernel(ff.ConstKernel(), self.data)
-        k.train()
+        k.train(cache=self.trainCache)
         return k
 
 
@@ -115,6 +135,23 @@ class GPCSearch(object):
 #                                            #
 ##############################################
 
+def removeDuplicates(kernels):
+    """
+    Remove structurally equivalent kernels, i.e. kernels with the same
+    canonical form regardless of their hyperparameters.
+
+    :param kernels: list of kernels of type `GPCKernel`
+    :returns: list of distinct kernels, in the order of first occurrence
+    """
+    unique, keys = [], set()
+    for k in kernels:
+        key = structureKey(k.kernel)
+        if key not in keys:
+            keys.add(key)
+            unique.append(k)
+    return unique
+
+
 def bestKernels1D(kernels):
     """
     Select the best 1-D kernels in each dimension according to cross-validated
@@ -3,8 +3,30 @@
 
 import numpy as np
 import pods
+import flexible_function as ff
+from gpckernel import GPCKernel
 from gpcdata import GPCData
-from gpcsearch import GPCSearch
+from gpcsearch import GPCSearch, removeDuplicates
+
+# Removal of structurally equivalent kernels, e.g. expanded from different
+# kernels in the search beam. Hyperparameters differ between equivalent
+# kernels, including ones which affect the canonical order of the operands.
+d = GPCData(np.random.uniform(1, 10, (50,3)), np.random.randint(0, 2, (50,1)).astype(float))
+def se(dim, ls):
+    return ff.SqExpKernel(dimension=dim, lengthscale=ls, sf=1)
+def sumOfProducts(ls1, ls2):
+    return ff.SumKernel([ff.ProductKernel([se(0, 1), se(1, ls1)]), ff.ProductKernel([se(0, 1), se(2, ls2)])])
+ks = [GPCKernel(k, d, 1) for k in [
+    ff.SumKernel([se(0, 1), se(1, 0.5)]),
+    se(1, 1),
+    ff.SumKernel([se(1, 2), se(0, 3)]),
+    se(0, 1),
+    sumOfProducts(2, 3),
+    se(1, 0.5),
+    sumOfProducts(3, 2) ]]
+unique = removeDuplicates(ks)
+assert len(unique) == 4
+assert all(u is k for u, k in zip(unique, [ks[0], ks[1], ks[3], ks[4]]))
 
 # 1D
 print "\n=====\n1D test:"